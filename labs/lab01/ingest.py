@@ -0,0 +1,383 @@
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+
+DATA_FILE = 'restaurant-data.txt'
+SHARD_DIR = 'review-shards'
+INDEX_FILE = 'index.json'
+# Append-only log of index entries created since index.json was last written, so a crashed
+# ingest never leaves shards the index doesn't know about
+INDEX_JOURNAL = 'index.log'
+# Dedupe digests of every stored review, plus how much of each shard they cover
+DIGEST_DB = 'digests.sqlite'
+
+# Each shard record is: 16-byte content digest, 4-byte little-endian length, utf-8 review text
+RECORD_HEADER = struct.Struct('<16sI')
+# Shards whose append handle is kept open at once
+MAX_OPEN_SHARDS = 64
+# Reviews written between digest table commits
+COMMIT_EVERY = 10000
+
+
+def normalize(name: str) -> str:
+    """
+    Normalizes restaurant name by converting to lowercase, dropping apostrophes,
+    replacing any other punctuation with spaces and collapsing repeated spaces.
+
+    Args:
+        name (str): Restaurant name to normalize
+
+    Returns:
+        str: Normalized restaurant name
+    """
+    name = name.lower().replace("'", '').replace('’', '')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name).split())
+
+
+def content_hash(name: str, review: str) -> bytes:
+    """
+    Returns the digest used to drop duplicate reviews of the same restaurant.
+    Whitespace and case differences do not produce a new review.
+    """
+    key = normalize(name) + '\n' + ' '.join(review.lower().split())
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+def split_review_line(line: str, known_names: Optional[Dict[str, str]] = None) -> Optional[Tuple[str, str, bool]]:
+    """
+    Splits a raw review line into (restaurant name, review text, confident).
+
+    Accepted layouts, in order of preference:
+        - "<name>\\t<review>" (explicit, used by exporters)
+        - "<name>. <review>" where the name is the longest ". "-terminated prefix that is
+          either an already indexed name or repeated in the review, so
+          "St. Louis. The food at St. Louis..." works even when "St" is indexed
+        - "<name>. <review>" split at the first ". " as a last resort; `confident` is False
+          and the name should not be trusted to parse later lines
+
+    Args:
+        line (str): Raw line from a review file
+        known_names (Dict[str, str]): Normalized name -> display name of confidently parsed restaurants
+
+    Returns:
+        Optional[Tuple[str, str, bool]]: The parsed triple, or None for blank / unparsable lines
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    if '\t' in line:
+        name, review = line.split('\t', 1)
+        name, review = name.strip(), review.strip()
+        return (name, review, True) if name and review else None
+
+    cuts = [m.start() for m in re.finditer(r'\. ', line)]
+    if not cuts:
+        return None
+
+    for cut in reversed(cuts):
+        name, review = line[:cut].strip(), line[cut + 2:].strip()
+        if not name or not review:
+            continue
+        known = known_names.get(normalize(name)) if known_names else None
+        if known:
+            return known, review, True
+        if re.search(r'\b' + re.escape(normalize(name)) + r'\b', normalize(review)):
+            return name, review, True
+
+    name, review = line[:cuts[0]].strip(), line[cuts[0] + 2:].strip()
+    return (name, review, False) if name and review else None
+
+
+def parse_review_line(line: str, known_names: Optional[Dict[str, str]] = None) -> Optional[Tuple[str, str]]:
+    """
+    Splits a raw review line into (restaurant name, review text), see split_review_line.
+    """
+    parsed = split_review_line(line, known_names)
+    return parsed[:2] if parsed else None
+
+
+def _stream_review_lines(paths: Iterable[str], known_names: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, str, bool]]:
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parsed = split_review_line(line, known_names)
+                if parsed:
+                    yield parsed
+
+
+def stream_reviews(paths: Iterable[str], known_names: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily yields (restaurant name, review text) pairs from review files, one line at a time.
+    """
+    for name, review, _ in _stream_review_lines(paths, known_names):
+        yield name, review
+
+
+def shard_filename(normalized_name: str) -> str:
+    slug = normalized_name.replace(' ', '-') or 'unnamed'
+    suffix = hashlib.blake2b(normalized_name.encode('utf-8'), digest_size=4).hexdigest()
+    return f'{slug[:48]}-{suffix}.bin'
+
+
+def iter_shard_records(path: str, offset: int = 0) -> Iterator[Tuple[bytes, str, int]]:
+    """
+    Yields (digest, review text, end offset) for each complete record of a binary shard
+    file, starting at byte `offset`.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            digest, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                # Record cut short by an interrupted ingest
+                return
+            offset += RECORD_HEADER.size + length
+            yield digest, data.decode('utf-8'), offset
+
+
+def iter_shard(path: str) -> Iterator[Tuple[bytes, str]]:
+    """
+    Yields (digest, review text) records from a binary shard file.
+    """
+    for digest, review, _ in iter_shard_records(path):
+        yield digest, review
+
+
+def load_index(shard_dir: str = SHARD_DIR) -> Dict[str, Dict]:
+    """
+    Returns the shard index: normalized name -> {"name", "shard", "count", "guessed"},
+    including entries journaled by an ingest that has not finished.
+    """
+    try:
+        with open(os.path.join(shard_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = {}
+    try:
+        with open(os.path.join(shard_dir, INDEX_JOURNAL), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    key, entry = json.loads(line)
+                except ValueError:
+                    # Last line of a crashed ingest may be incomplete
+                    continue
+                index.setdefault(key, {}).update(entry)
+    except FileNotFoundError:
+        pass
+    return index
+
+
+_index_cache: Dict[str, Tuple[Tuple, Dict[str, Dict]]] = {}
+
+
+def load_index_cached(shard_dir: str = SHARD_DIR) -> Dict[str, Dict]:
+    """
+    Same as load_index, but only re-reads the file when its modification time changes.
+    """
+    mtime = tuple(
+        os.stat(path).st_mtime if os.path.exists(path) else None
+        for path in (os.path.join(shard_dir, INDEX_FILE), os.path.join(shard_dir, INDEX_JOURNAL))
+    )
+    if mtime == (None, None):
+        return {}
+    cached = _index_cache.get(shard_dir)
+    if cached is None or cached[0] != mtime:
+        cached = _index_cache[shard_dir] = (mtime, load_index(shard_dir))
+    return cached[1]
+
+
+def save_index(index: Dict[str, Dict], shard_dir: str = SHARD_DIR) -> None:
+    path = os.path.join(shard_dir, INDEX_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    try:
+        os.remove(os.path.join(shard_dir, INDEX_JOURNAL))
+    except FileNotFoundError:
+        pass
+
+
+def find_restaurant(restaurant_name: str, index: Dict[str, Dict]) -> Optional[str]:
+    """
+    Resolves a restaurant name to its index key: exact normalized match first,
+    then the shortest indexed name starting with the query.
+    """
+    key = normalize(restaurant_name)
+    if not key:
+        return None
+    if key in index:
+        return key
+    matches = sorted((k for k in index if k.startswith(key)), key=len)
+    return matches[0] if matches else None
+
+
+def read_restaurant_reviews(restaurant_name: str, shard_dir: str = SHARD_DIR,
+                            index: Optional[Dict[str, Dict]] = None) -> Dict[str, List[str]]:
+    """
+    Reads all reviews for a restaurant straight from its shard.
+
+    Returns:
+        Dict[str, List[str]]: Dictionary with restaurant name as key and list of reviews as value,
+        or an empty dictionary when the restaurant is not indexed
+    """
+    if index is None:
+        index = load_index(shard_dir)
+    key = find_restaurant(restaurant_name, index)
+    if key is None:
+        return {}
+    entry = index[key]
+    reviews = [review for _, review in iter_shard(os.path.join(shard_dir, entry['shard']))]
+    return {entry['name']: reviews} if reviews else {}
+
+
+class ShardWriter:
+    """
+    Appends reviews to per-restaurant shards. Dedupe digests live in a sqlite table next to
+    the shards, so only the MAX_OPEN_SHARDS most recently used file handles are kept open
+    and reopening a shard never re-reads it.
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR):
+        self.shard_dir = shard_dir
+        os.makedirs(shard_dir, exist_ok=True)
+        self.index = load_index(shard_dir)
+        # key -> append handle, least recently used first
+        self._open: 'OrderedDict[str, BinaryIO]' = OrderedDict()
+        self._journal = open(os.path.join(shard_dir, INDEX_JOURNAL), 'a', encoding='utf-8')
+        self._db = sqlite3.connect(os.path.join(shard_dir, DIGEST_DB))
+        self._db.execute('CREATE TABLE IF NOT EXISTS digests (digest BLOB PRIMARY KEY) WITHOUT ROWID')
+        self._db.execute('CREATE TABLE IF NOT EXISTS shards (shard TEXT PRIMARY KEY, size INTEGER, count INTEGER)')
+        # Shards written since the last commit, and how many records that was
+        self._dirty: Set[str] = set()
+        self._pending = 0
+        self._recover()
+        # Live view of confidently parsed names, so names first seen in this run also guide parsing
+        self.known_names = {key: entry['name'] for key, entry in self.index.items() if not entry.get('guessed')}
+
+    def _recover(self) -> None:
+        """
+        Brings the digest table up to date with records appended after its last commit
+        (an interrupted ingest, or shards written before the table existed), and drops a
+        record cut short at the end of a shard so new records are not appended after it.
+        """
+        committed = {shard: (size, count) for shard, size, count in self._db.execute('SELECT * FROM shards')}
+        for entry in self.index.values():
+            path = os.path.join(self.shard_dir, entry['shard'])
+            if not os.path.exists(path):
+                continue
+            size, count = committed.get(entry['shard'], (0, 0))
+            if os.path.getsize(path) > size:
+                for digest, _, size in iter_shard_records(path, size):
+                    self._db.execute('INSERT OR IGNORE INTO digests VALUES (?)', (digest,))
+                    count += 1
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+                self._db.execute('INSERT OR REPLACE INTO shards VALUES (?, ?, ?)', (entry['shard'], size, count))
+            entry['count'] = count
+        self._db.commit()
+
+    def _add_entry(self, key: str, name: str, guessed: bool) -> None:
+        entry = self.index.setdefault(key, {'shard': shard_filename(key), 'count': 0})
+        entry.update(name=name, guessed=guessed)
+        self._journal.write(json.dumps([key, entry]) + '\n')
+        self._journal.flush()
+        if not guessed:
+            self.known_names[key] = name
+
+    def _handle(self, key: str) -> BinaryIO:
+        """Returns the append handle of a shard, closing the least recently used one."""
+        handle = self._open.pop(key, None)
+        if handle is None:
+            if len(self._open) >= MAX_OPEN_SHARDS:
+                _, oldest = self._open.popitem(last=False)
+                oldest.close()
+            handle = open(os.path.join(self.shard_dir, self.index[key]['shard']), 'ab')
+        self._open[key] = handle
+        return handle
+
+    def _commit(self) -> None:
+        """Flushes the shards and records how far each one is covered by committed digests."""
+        for handle in self._open.values():
+            handle.flush()
+        for key in self._dirty:
+            entry = self.index[key]
+            size = os.path.getsize(os.path.join(self.shard_dir, entry['shard']))
+            self._db.execute('INSERT OR REPLACE INTO shards VALUES (?, ?, ?)', (entry['shard'], size, entry['count']))
+        self._db.commit()
+        self._dirty.clear()
+        self._pending = 0
+
+    def write(self, name: str, review: str, confident: bool = True) -> bool:
+        """
+        Appends one review, returning False if it was a duplicate. Names parsed with the
+        last-resort rule (confident=False) are stored but never used to parse other lines.
+        """
+        key = normalize(name)
+        entry = self.index.get(key)
+        if entry is None or (confident and entry.get('guessed')):
+            self._add_entry(key, name, not confident)
+        digest = content_hash(name, review)
+        if self._db.execute('INSERT OR IGNORE INTO digests VALUES (?)', (digest,)).rowcount == 0:
+            return False
+        data = review.encode('utf-8')
+        handle = self._handle(key)
+        handle.write(RECORD_HEADER.pack(digest, len(data)))
+        handle.write(data)
+        self.index[key]['count'] += 1
+        self._dirty.add(key)
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._commit()
+        return True
+
+    def close(self) -> None:
+        self._commit()
+        for handle in self._open.values():
+            handle.close()
+        self._open.clear()
+        self._db.close()
+        self._journal.close()
+        save_index(self.index, self.shard_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ingest(paths: Iterable[str], shard_dir: str = SHARD_DIR) -> Dict[str, int]:
+    """
+    Streams review files into per-restaurant shards, skipping duplicates.
+
+    Args:
+        paths (Iterable[str]): Review files, one "<name>. <review>" or "<name>\\t<review>" per line
+        shard_dir (str): Directory holding the shards and their index
+
+    Returns:
+        Dict[str, int]: Counts of written and duplicate reviews
+    """
+    stats = {'written': 0, 'duplicates': 0}
+    with ShardWriter(shard_dir) as writer:
+        for name, review, confident in _stream_review_lines(paths, writer.known_names):
+            if writer.write(name, review, confident):
+                stats['written'] += 1
+            else:
+                stats['duplicates'] += 1
+    return stats
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or [DATA_FILE]
+    print(ingest(files))
@@ -1,8 +1,14 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from autogen import ConversableAgent
 import sys
 import os
-from autogen import register_function
+import logging
+from autogen.io import IOStream
+from prefetch import MATCH_WAIT, NameMatcher, ReviewPrefetcher
+from routing import parse_scores, run_cascade, validate_analysis
+from ingest import DATA_FILE, SHARD_DIR, load_index_cached, normalize, read_restaurant_reviews, stream_reviews
 
 # Constants for scoring
 SCORE_KEYWORDS = {
@@ -14,61 +20,43 @@ SCORE_KEYWORDS = {
 }
 
 # Data processing functions
-def normalize(name: str) -> str:
+def fetch_restaurant_data(restaurant_name: str, shard_dir: str = SHARD_DIR) -> Dict[str, List[str]]:
     """
-    Normalizes restaurant name by converting to lowercase, replacing punctuation with spaces,
-    and removing extra spaces.
-    Args:
-    
-        name (str): Restaurant name to normalize
-        
-    Returns:
-        str: Normalized restaurant name
-    """
-    return (name.lower()
-            .replace('-', ' ')
-            .replace('.', ' ')
-            .replace('  ', ' ')
-            .strip())
-
-def fetch_restaurant_data(restaurant_name: str) -> Dict[str, List[str]]:
-    """
-    Fetches reviews for a specific restaurant from the data file.
+    Fetches reviews for a specific restaurant, reading its shard when the data has been
+    ingested (see ingest.py) and streaming the flat data file otherwise.
     
     Args:
         restaurant_name (str): Name of the restaurant to search for
+        shard_dir (str): Directory holding the ingested shards
         
     Returns:
         Dict[str, List[str]]: Dictionary with restaurant name as key and list of reviews as value
     """
+    index = load_index_cached(shard_dir)
+    if index:
+        return read_restaurant_reviews(restaurant_name, shard_dir, index)
+    
     restaurant_data = {}
     reviews = []
     actual_name = None
     
     # Normalize the restaurant name
     restaurant_name_normalized = normalize(restaurant_name)
-    
+    if not restaurant_name_normalized:
+        return {}
+
     try:
-        with open('restaurant-data.txt', 'r') as f:
-            lines = f.readlines()
-        
-        for line in lines:
-            if not line.strip():
-                continue
-            
-            # Normalize the line using the same function
-            line_normalized = normalize(line)
-            
-            if line_normalized.startswith(restaurant_name_normalized):
-                actual_name = line.split('.')[0].strip()
-                reviews.append(line.strip())
+        for name, review in stream_reviews([DATA_FILE]):
+            if normalize(name).startswith(restaurant_name_normalized):
+                actual_name = actual_name or name
+                reviews.append(review)
         
         if actual_name and reviews:
             restaurant_data[actual_name] = reviews
                 
         return restaurant_data
     except FileNotFoundError:
-        print("Error: restaurant-data.txt not found")
+        print(f"Error: {DATA_FILE} not found")
         return {}
 
 def calculate_overall_score(restaurant_name: str, food_scores: List[int], customer_service_scores: List[int]) -> Dict[str, str]:
@@ -95,13 +83,13 @@ def calculate_overall_score(restaurant_name: str, food_scores: List[int], custom
     formatted_score = "{:.3f}".format(total)
     return {restaurant_name: formatted_score}
 
-def get_data_fetch_agent_prompt(restaurant_query: str) -> str:
-    return f"""You are a data fetch agent responsible for extracting restaurant names from user queries and fetching their reviews.
+def get_data_fetch_agent_prompt() -> str:
+    return """You are a data fetch agent responsible for extracting restaurant names from user queries.
     
     Your task:
-    1. Analyze the user query: "{restaurant_query}"
+    1. Analyze the user query
     2. Extract the restaurant name from the query
-    3. Call the fetch_restaurant_data function with the extracted name
+    3. Reply with the restaurant name only, exactly as written in the query, without any other text
     """
 
 def get_review_analyzer_prompt() -> str:
@@ -123,16 +111,6 @@ def get_review_analyzer_prompt() -> str:
     food_scores = [score1, score2, ...]
     customer_service_scores = [score1, score2, ...]"""
 
-def get_scoring_agent_prompt() -> str:
-    return """You are a scoring agent. Your task is to take the food scores and customer service scores from the previous conversation and calculate the final rating.
-
-    Steps:
-    1. Extract the restaurant name from the data fetch result
-    2. Get the food_scores and customer_service_scores lists from the analyzer
-    3. Call calculate_overall_score with these exact parameters
-    
-    """
-
 def create_agent(name: str, system_message: str, llm_config: dict) -> ConversableAgent:
     """Helper function to create agents with consistent configuration."""
     return ConversableAgent(
@@ -141,94 +119,112 @@ def create_agent(name: str, system_message: str, llm_config: dict) -> Conversabl
         llm_config=llm_config
     )
 
-def main(user_query: str):
+def get_llm_config(model: str, http_client=None) -> dict:
+    config = {"model": model, "api_key": os.environ.get("OPENAI_API_KEY")}
+    if http_client is not None:
+        # Reuse a long-lived connection pool instead of opening one per agent
+        config["http_client"] = http_client
+    return {"config_list": [config]}
+
+@lru_cache(maxsize=None)
+def get_agents(model: str, http_client=None) -> Dict[str, ConversableAgent]:
+    """
+    Creates the LLM-backed agents for one model. Their prompts do not depend on the query
+    and ask_agent calls the model statelessly, so the agents are reused across queries.
+    """
+    llm_config = get_llm_config(model, http_client)
+    return {
+        "data_fetch": create_agent("data_fetch_agent", get_data_fetch_agent_prompt(), llm_config),
+        "analyzer": create_agent("review_analyzer_agent", get_review_analyzer_prompt(), llm_config)
+    }
+
+def ask_agent(agent: ConversableAgent, message: str) -> str:
+    """
+    Runs a single completion with the agent's system message and returns its text reply.
+    
+    This calls the model directly rather than going through generate_reply, whose
+    termination/human-input check keeps a per-sender auto-reply counter on the agent;
+    on agents shared across queries and threads that counter eventually asks for stdin input.
+    """
+    _, reply = agent.generate_oai_reply(messages=[{"role": "user", "content": message}])
+    if isinstance(reply, dict):
+        reply = reply.get("content")
+    return reply or ""
+
+@dataclass
+class RatingResult:
+    restaurant_name: str
+    reviews: List[str]
+    food_scores: List[int]
+    customer_service_scores: List[int]
+    overall_score: Dict[str, str]
+
+    def __str__(self) -> str:
+        return f"{self.restaurant_name}: {self.overall_score[self.restaurant_name]} ({len(self.reviews)} reviews)"
+
+def main(user_query: str, matcher: Optional[NameMatcher] = None, http_client=None,
+         shard_dir: str = SHARD_DIR) -> RatingResult:
     """
     Main function to process restaurant queries and return ratings.
     
+    The workflow is fixed, so it is orchestrated in code: fetch_restaurant_data and
+    calculate_overall_score are called directly, and an LLM is only used to extract the
+    restaurant name (when local matching is ambiguous) and to analyze the reviews.
+    Each LLM stage runs on the cheapest model in routing.MODEL_CASCADE first and is
+    retried on the next model only if its output fails validation.
+    
     Args:
         user_query (str): User's query about a restaurant
+        matcher (NameMatcher): Known restaurant names, loaded from disk (and cached) when omitted
+        http_client: Shared httpx client for the OpenAI calls (see serve.py)
+        shard_dir (str): Directory holding the ingested shards
         
     Returns:
-        The result of the agent conversation chain
+        RatingResult: The restaurant, its reviews, the per-review scores and the overall score
     """
-    llm_config = {"config_list": [{"model": "gpt-4o", "api_key": os.environ.get("OPENAI_API_KEY")}]}
-    
-    # Create the entrypoint agent
-    entrypoint_agent = create_agent(
-        "entrypoint_agent",
-        """You are the supervisor agent coordinating the restaurant review analysis process.
-        Follow these steps exactly:
-        1. First, ask the data fetch agent to get restaurant reviews using fetch_restaurant_data
-        2. Once you have the reviews, send them to the review analyzer to extract scores
-        3. After getting the scores from the analyzer, ask the scoring agent to calculate the final rating
-        """,
-        llm_config
-    )
+    # Guess the restaurant locally and start loading its reviews while the first LLM turn runs
+    prefetcher = ReviewPrefetcher(partial(fetch_restaurant_data, shard_dir=shard_dir), matcher, shard_dir)
+    prefetcher.start(user_query)
     
-    # Create specialized agents
-    agents = {
-        "data_fetch": create_agent(
-            "data_fetch_agent", 
-            get_data_fetch_agent_prompt(user_query), 
-            llm_config
-        ),
-        "analyzer": create_agent(
-            "review_analyzer_agent", 
-            get_review_analyzer_prompt(), 
-            llm_config
-        ),
-        "scorer": create_agent(
-            "scoring_agent", 
-            get_scoring_agent_prompt(), 
-            llm_config
-        )
-    }
-    
-    # Register functions for all necessary agents
-    # Data fetch related
-    register_function(
-        fetch_restaurant_data,
-        caller=entrypoint_agent,  
-        executor=agents['data_fetch'], 
-        name="fetch_restaurant_data", 
-        description="Fetches the reviews for a specific restaurant."
+    try:
+        restaurant_data = prefetcher.unambiguous(timeout=MATCH_WAIT)
+        if not restaurant_data:
+            def extract_and_fetch(model: str) -> Dict[str, List[str]]:
+                name = ask_agent(get_agents(model, http_client)["data_fetch"], user_query).strip().strip('"\'.')
+                return prefetcher.fetch_restaurant_data(name) if name else {}
+            
+            restaurant_data, ok = run_cascade("data_fetch", extract_and_fetch, bool)
+            if not ok:
+                raise ValueError(f"Could not find a known restaurant in the query: {user_query}")
+    finally:
+        prefetcher.close()
+    
+    restaurant_name, reviews = next(iter(restaurant_data.items()))
+    analyze_message = (
+        f"Here are the reviews for {restaurant_name}. Please analyze them and extract food and service scores. "
+        "For each review, find the food quality keyword and service quality keyword, then map them to scores 1-5 "
+        "according to the scoring rules.\n\n" + "\n".join(reviews)
     )
-    
-    # Scoring related
-    register_function(
-        calculate_overall_score,
-        caller=entrypoint_agent,  
-        executor=agents['scorer'], 
-        name="calculate_overall_score", 
-        description="Calculates the overall score for a restaurant."
+    analysis, ok = run_cascade(
+        "analyzer",
+        lambda model: ask_agent(get_agents(model, http_client)["analyzer"], analyze_message),
+        lambda reply: validate_analysis(reply, len(reviews))
     )
-    
-    # Update chat sequence with more explicit messages
-    chat_sequence = [
-        {
-            "recipient": agents["data_fetch"],
-            "message": f"Find reviews for this query: {user_query}",
-            "summary_method": "last_msg",
-            "max_turns": 2
-        },
-        {
-            "recipient": agents["analyzer"],
-            "message": "Here are the reviews from the data fetch agent. Please analyze them and extract food and service scores. For each review, find the food quality keyword and service quality keyword, then map them to scores 1-5 according to the scoring rules.",
-            "summary_method": "last_msg",
-            "max_turns": 1
-        },
-        {
-            "recipient": agents["scorer"],
-            "message": "Using the food_scores and customer_service_scores from the analyzer, please calculate the final restaurant rating using calculate_overall_score.",
-            "summary_method": "last_msg",
-            "max_turns": 2
-        }
-    ]
-    
-    result = entrypoint_agent.initiate_chats(chat_sequence)
-    print(result)
+    if not ok:
+        raise ValueError(f"Review analysis for {restaurant_name} did not produce one score pair per review")
+    food_scores, customer_service_scores = parse_scores(analysis)
+    
+    result = RatingResult(
+        restaurant_name=restaurant_name,
+        reviews=reviews,
+        food_scores=food_scores,
+        customer_service_scores=customer_service_scores,
+        overall_score=calculate_overall_score(restaurant_name, food_scores, customer_service_scores)
+    )
+    IOStream.get_default().print(result)
     return result
 
 if __name__ == "__main__":
     assert len(sys.argv) > 1, "Please ensure you include a query for some restaurant when executing main."
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
     main(sys.argv[1])
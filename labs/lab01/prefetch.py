@@ -0,0 +1,177 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from difflib import SequenceMatcher
+import os
+import threading
+
+from ingest import DATA_FILE, INDEX_FILE, INDEX_JOURNAL, SHARD_DIR, load_index_cached, normalize, split_review_line
+
+FUZZY_CUTOFF = 0.85
+# Known names sharing the most character trigrams with the query that are compared fuzzily
+FUZZY_CANDIDATES = 20
+# How long main waits for local matching before starting the LLM name extraction anyway
+MATCH_WAIT = 0.05
+
+
+def trigrams(text: str) -> Set[str]:
+    text = f' {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameMatcher:
+    """
+    Guesses which known restaurants a raw user query is about, without an LLM.
+
+    Exact mentions are looked up phrase by phrase in the name set; otherwise a
+    trigram index narrows the fuzzy comparison to a few candidates, so small typos
+    ("chik fil a") still match without scanning every known name.
+    """
+
+    def __init__(self, known: Dict[str, str]):
+        self.known = known
+        self._max_words = max((len(key.split()) for key in known), default=0)
+        self._by_trigram: Dict[str, List[str]] = defaultdict(list)
+        for key in known:
+            for gram in trigrams(key):
+                self._by_trigram[gram].append(key)
+
+    def match(self, query: str) -> List[str]:
+        """
+        Returns:
+            List[str]: Display names of the candidates, best first
+        """
+        text = normalize(query)
+        words = text.split()
+        exact = {
+            phrase
+            for size in range(1, min(self._max_words, len(words)) + 1)
+            for phrase in (' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+            if phrase in self.known
+        }
+        # "burger king" also contains "king"; keep only the longest overlapping mentions
+        exact = [key for key in exact if not any(key != other and f' {key} ' in f' {other} ' for other in exact)]
+        if exact:
+            return [self.known[key] for key in sorted(exact, key=len, reverse=True)]
+
+        shared = Counter(key for gram in trigrams(text) for key in self._by_trigram.get(gram, ()))
+        scored = []
+        for key, _ in shared.most_common(FUZZY_CANDIDATES):
+            size = len(key.split())
+            phrases = [' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))]
+            ratio = max((SequenceMatcher(None, key, phrase).ratio() for phrase in phrases), default=0)
+            if ratio >= FUZZY_CUTOFF:
+                scored.append((ratio, self.known[key]))
+        return [name for _, name in sorted(scored, reverse=True)]
+
+
+_matcher_cache: Dict[Tuple[str, str], Tuple[Tuple, NameMatcher]] = {}
+_matcher_lock = threading.Lock()
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def name_matcher(shard_dir: str = SHARD_DIR, data_file: str = DATA_FILE) -> NameMatcher:
+    """
+    Returns a matcher over every restaurant we hold reviews for, from the shard index when
+    the data is ingested and from the flat data file otherwise. The name set and its index
+    are rebuilt only when those files change.
+    """
+    stamp = (
+        _mtime(os.path.join(shard_dir, INDEX_FILE)),
+        _mtime(os.path.join(shard_dir, INDEX_JOURNAL)),
+        _mtime(data_file)
+    )
+    with _matcher_lock:
+        cached = _matcher_cache.get((shard_dir, data_file))
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        index = load_index_cached(shard_dir)
+        if index:
+            # Names from the last-resort split ("St" of "St. Elmo Steak House") would match
+            # unrelated queries unambiguously, so only confidently parsed names are matched
+            known = {key: entry['name'] for key, entry in index.items() if not entry.get('guessed')}
+        else:
+            known = {}
+            try:
+                with open(data_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parsed = split_review_line(line, known)
+                        if parsed and parsed[2]:
+                            known.setdefault(normalize(parsed[0]), parsed[0])
+            except FileNotFoundError:
+                pass
+        matcher = NameMatcher(known)
+        _matcher_cache[(shard_dir, data_file)] = (stamp, matcher)
+        return matcher
+
+
+class ReviewPrefetcher:
+    """
+    Speculatively matches the query against known restaurants and loads their reviews in
+    the background while the data fetch agent is still reading it, and serves the tool
+    call from that cache.
+    """
+
+    def __init__(self, fetch: Callable[[str], Dict[str, List[str]]], matcher: Optional[NameMatcher] = None,
+                 shard_dir: str = SHARD_DIR):
+        self.fetch = fetch
+        self.matcher = matcher
+        self.shard_dir = shard_dir
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._candidates: Optional[Future] = None
+
+    def _match(self, query: str) -> List[str]:
+        candidates = (self.matcher or name_matcher(self.shard_dir)).match(query)
+        for name in candidates:
+            future = self._executor.submit(self.fetch, name)
+            with self._lock:
+                self._futures[normalize(name)] = future
+        return candidates
+
+    def start(self, query: str) -> None:
+        """Starts matching candidates and fetching their reviews in the background."""
+        self._candidates = self._executor.submit(self._match, query)
+
+    def unambiguous(self, timeout: Optional[float] = None) -> Optional[Dict[str, List[str]]]:
+        """
+        Reviews of the only candidate, or None when the fetch agent still has to decide,
+        including when matching has not finished within `timeout` seconds.
+        """
+        try:
+            candidates = self._candidates.result(timeout)
+        except TimeoutError:
+            return None
+        if len(candidates) != 1:
+            return None
+        with self._lock:
+            future = self._futures[normalize(candidates[0])]
+        return future.result() or None
+
+    def fetch_restaurant_data(self, restaurant_name: str) -> Dict[str, List[str]]:
+        """
+        Drop-in replacement for fetch_restaurant_data that answers from the prefetched
+        reviews when the agent asks for a candidate we already loaded.
+        """
+        key = normalize(restaurant_name)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                matches = [k for k in self._futures if k.startswith(key)] if key else []
+                future = self._futures.get(matches[0]) if len(matches) == 1 else None
+        if future is not None:
+            data = future.result()
+            if data:
+                return data
+        return self.fetch(restaurant_name)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from multiprocessing import Pool
+import json
+import os
+import re
+import sys
+
+from ingest import SHARD_DIR, find_restaurant, iter_shard, load_index
+from main import SCORE_KEYWORDS, calculate_overall_score
+
+RANKINGS_FILE = 'rankings.json'
+METRICS = ('overall', 'food', 'service')
+
+KEYWORD_PATTERN = re.compile(
+    r'\b(' + '|'.join(word for words in SCORE_KEYWORDS.values() for word in words) + r')\b',
+    re.IGNORECASE
+)
+KEYWORD_SCORES = {word: score for score, words in SCORE_KEYWORDS.items() for word in words}
+
+
+def keyword_scores(review: str) -> Optional[Tuple[int, int]]:
+    """
+    Scores a review locally with the same keyword mapping the analyzer agent uses.
+    The first keyword describes the food and the second the customer service.
+
+    Returns:
+        Optional[Tuple[int, int]]: (food score, customer service score), or None if the
+        review does not contain two keywords
+    """
+    words = KEYWORD_PATTERN.findall(review)
+    if len(words) < 2:
+        return None
+    return KEYWORD_SCORES[words[0].lower()], KEYWORD_SCORES[words[1].lower()]
+
+
+def score_restaurant(args: Tuple[str, Dict, str]) -> Optional[Dict]:
+    """
+    Pool worker: scores every review in one shard and aggregates them with calculate_overall_score.
+    """
+    key, entry, shard_dir = args
+    food_scores, customer_service_scores = [], []
+    for _, review in iter_shard(os.path.join(shard_dir, entry['shard'])):
+        scores = keyword_scores(review)
+        if scores:
+            food_scores.append(scores[0])
+            customer_service_scores.append(scores[1])
+    if not food_scores:
+        return None
+    overall = calculate_overall_score(entry['name'], food_scores, customer_service_scores)[entry['name']]
+    return {
+        'key': key,
+        'name': entry['name'],
+        'overall': float(overall),
+        'food': sum(food_scores) / len(food_scores),
+        'service': sum(customer_service_scores) / len(customer_service_scores),
+        'reviews': len(food_scores)
+    }
+
+
+def build_rankings(shard_dir: str = SHARD_DIR, processes: Optional[int] = None) -> List[Dict]:
+    """
+    Scores the whole catalog across all cores and writes the results next to the shards.
+
+    Args:
+        shard_dir (str): Directory produced by ingest.py
+        processes (int): Worker count, defaults to os.cpu_count()
+
+    Returns:
+        List[Dict]: One score record per restaurant
+    """
+    index = load_index(shard_dir)
+    if not index:
+        raise FileNotFoundError(f"No shard index in {shard_dir}, run ingest.py first")
+    jobs = [(key, entry, shard_dir) for key, entry in index.items()]
+    with Pool(processes or os.cpu_count()) as pool:
+        chunksize = max(1, len(jobs) // ((processes or os.cpu_count() or 1) * 8))
+        records = [r for r in pool.imap_unordered(score_restaurant, jobs, chunksize) if r]
+
+    path = os.path.join(shard_dir, RANKINGS_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(records, f)
+    os.replace(path + '.tmp', path)
+    return records
+
+
+class RankingIndex:
+    """In-memory sorted views over precomputed restaurant scores, one per metric."""
+
+    def __init__(self, records: List[Dict]):
+        self.records = {r['key']: r for r in records}
+        self._sorted = {}
+        self._values = {}
+        for metric in METRICS:
+            ordered = sorted(records, key=lambda r: (r[metric], r['name']))
+            self._sorted[metric] = ordered
+            self._values[metric] = [r[metric] for r in ordered]
+
+    @classmethod
+    def load(cls, shard_dir: str = SHARD_DIR) -> 'RankingIndex':
+        with open(os.path.join(shard_dir, RANKINGS_FILE), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def top(self, k: int = 10, metric: str = 'overall') -> List[Dict]:
+        """Best k restaurants by metric, highest first."""
+        return self._sorted[metric][-k:][::-1] if k > 0 else []
+
+    def bottom(self, k: int = 10, metric: str = 'overall') -> List[Dict]:
+        """Worst k restaurants by metric, lowest first."""
+        return self._sorted[metric][:k]
+
+    def between(self, low: float, high: float, metric: str = 'overall') -> List[Dict]:
+        """All restaurants with low <= metric <= high, lowest first."""
+        values = self._values[metric]
+        return self._sorted[metric][bisect_left(values, low):bisect_right(values, high)]
+
+    def score(self, restaurant_name: str) -> Optional[Dict]:
+        key = find_restaurant(restaurant_name, self.records)
+        return self.records[key] if key else None
+
+
+def format_record(record: Dict) -> str:
+    return "{name}: overall {overall:.3f}, food {food:.2f}, service {service:.2f} ({reviews} reviews)".format(**record)
+
+
+if __name__ == "__main__":
+    assert len(sys.argv) > 1, "Usage: ranking.py build | top K [metric] | bottom K [metric] | between LOW HIGH [metric] | score NAME"
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == 'build':
+        print(f"Scored {len(build_rankings())} restaurants")
+        sys.exit()
+
+    rankings = RankingIndex.load()
+    if command == 'top':
+        results = rankings.top(int(args[0]) if args else 10, *args[1:2])
+    elif command == 'bottom':
+        results = rankings.bottom(int(args[0]) if args else 10, *args[1:2])
+    elif command == 'between':
+        results = rankings.between(float(args[0]), float(args[1]), *args[2:3])
+    elif command == 'score':
+        results = [r for r in [rankings.score(' '.join(args))] if r]
+    else:
+        raise SystemExit(f"Unknown command: {command}")
+    for record in results:
+        print(format_record(record))
@@ -0,0 +1,80 @@
+from typing import Callable, List, Optional, Tuple
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cheapest/fastest first; a stage only moves down the list when its output fails validation
+# or the call itself fails
+MODEL_CASCADE = ["gpt-4o-mini", "gpt-4o"]
+
+SCORE_LIST_PATTERN = r'{}\s*=\s*\[([^\]]*)\]'
+
+
+def parse_scores(text: str) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    Parses the analyzer output format:
+        food_scores = [score1, score2, ...]
+        customer_service_scores = [score1, score2, ...]
+    """
+    lists = []
+    for name in ("food_scores", "customer_service_scores"):
+        match = re.search(SCORE_LIST_PATTERN.format(name), text or "")
+        if not match:
+            return None
+        try:
+            lists.append([int(x) for x in match.group(1).replace(" ", "").split(",") if x])
+        except ValueError:
+            return None
+    return lists[0], lists[1]
+
+
+def validate_analysis(reply: str, review_count: int) -> bool:
+    """Both score lists parse, hold 1-5 scores and have one entry per review."""
+    scores = parse_scores(reply)
+    if scores is None:
+        return False
+    food_scores, customer_service_scores = scores
+    return (len(food_scores) == len(customer_service_scores) == review_count
+            and all(1 <= s <= 5 for s in food_scores + customer_service_scores))
+
+
+def run_cascade(stage: str, attempt: Callable[[str], object], validator: Callable[[object], bool],
+                models: List[str] = MODEL_CASCADE) -> Tuple[object, bool]:
+    """
+    Runs one pipeline stage on each model in turn until its output passes validation.
+    A model whose call raises (rate limit, context length, timeout) is logged as a failed
+    attempt and skipped; the error is only re-raised when it comes from the last model.
+
+    Args:
+        stage (str): Stage name used in the routing log
+        attempt (Callable[[str], object]): Runs the stage with the given model and returns its output
+        validator (Callable[[object], bool]): Checks the output
+        models (List[str]): Models to try, cheapest first
+
+    Returns:
+        Tuple[object, bool]: The accepted (or last) output and whether it passed validation
+    """
+    result = None
+    for model in models:
+        last = model == models[-1]
+        start = time.perf_counter()
+        try:
+            result = attempt(model)
+        except Exception as e:
+            logger.warning("stage=%s model=%s error=%s(%r) elapsed=%.2fs",
+                           stage, model, type(e).__name__, e, time.perf_counter() - start)
+            if last:
+                logger.error("stage=%s failed on every model", stage)
+                raise
+            logger.warning("stage=%s escalating from %s after an error", stage, model)
+            continue
+        ok = validator(result)
+        logger.info("stage=%s model=%s valid=%s elapsed=%.2fs", stage, model, ok, time.perf_counter() - start)
+        if ok:
+            return result, True
+        if not last:
+            logger.warning("stage=%s escalating from %s after failed validation", stage, model)
+    logger.error("stage=%s failed validation on every model", stage)
+    return result, False
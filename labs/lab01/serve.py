@@ -0,0 +1,223 @@
+from typing import Dict, Optional
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import logging
+import threading
+import time
+
+import httpx
+
+from ingest import SHARD_DIR, normalize
+from main import main
+from prefetch import NameMatcher, name_matcher
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 1000
+THROUGHPUT_WINDOW = 60
+
+
+class SharedHttpClient(httpx.Client):
+    """httpx client that survives autogen's deep copy of llm_config, so every agent shares one pool."""
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class RatingService:
+    """
+    Keeps the restaurant names, review index, HTTP pool and computed scores warm across
+    requests, and runs each distinct restaurant at most once at a time.
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR, max_connections: int = 32):
+        self.shard_dir = shard_dir
+        self.http_client = SharedHttpClient(limits=httpx.Limits(max_connections=max_connections), timeout=60)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._scores: Dict[str, Dict] = {}
+        self._matcher: Optional[NameMatcher] = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        # (second, requests completed in that second), oldest first, covering THROUGHPUT_WINDOW
+        self._completed = deque()
+        self.started = time.time()
+        self.counters = {"requests": 0, "cache_hits": 0, "coalesced": 0, "errors": 0}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Picks up the current restaurant names and drops cached scores when they have changed."""
+        matcher = name_matcher(self.shard_dir)
+        if matcher is self._matcher:
+            return
+        with self._lock:
+            self._matcher = matcher
+            self._scores.clear()
+
+    def _key(self, query: str) -> str:
+        candidates = self._matcher.match(query)
+        return "restaurant:" + normalize(candidates[0]) if len(candidates) == 1 else "query:" + normalize(query)
+
+    def _compute(self, query: str) -> Dict:
+        result = main(query, matcher=self._matcher, http_client=self.http_client, shard_dir=self.shard_dir)
+        return {"restaurant": result.restaurant_name, "score": float(result.overall_score[result.restaurant_name])}
+
+    def rate(self, query: str) -> Dict:
+        """
+        Answers one rating query, from the score cache, by joining an identical in-flight
+        request, or by running the pipeline.
+        """
+        start = time.perf_counter()
+        self.refresh()
+        key = self._key(query)
+        owner = False
+        with self._lock:
+            self.counters["requests"] += 1
+            cached = self._scores.get(key)
+            if cached is None:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = Future()
+                    owner = True
+                else:
+                    self.counters["coalesced"] += 1
+            else:
+                self.counters["cache_hits"] += 1
+
+        if cached is not None:
+            response = {**cached, "cached": True, "coalesced": False}
+        else:
+            if owner:
+                try:
+                    scored = self._compute(query)
+                except Exception as e:
+                    with self._lock:
+                        self._in_flight.pop(key, None)
+                    future.set_exception(e)
+                else:
+                    # Publish the score before retiring the in-flight entry, so no request can miss both
+                    with self._lock:
+                        self._scores[key] = scored
+                        self._scores["restaurant:" + normalize(scored["restaurant"])] = scored
+                        self._in_flight.pop(key, None)
+                    future.set_result(scored)
+            try:
+                scored = future.result()
+            except Exception:
+                with self._lock:
+                    self.counters["errors"] += 1
+                raise
+            response = {**scored, "cached": False, "coalesced": not owner}
+
+        latency = time.perf_counter() - start
+        second = int(time.time())
+        with self._lock:
+            self._latencies.append(latency)
+            if self._completed and self._completed[-1][0] == second:
+                self._completed[-1][1] += 1
+            else:
+                self._completed.append([second, 1])
+            self._drop_old_buckets(second)
+        return {"query": query, **response, "latency_ms": round(latency * 1000, 3)}
+
+    def _drop_old_buckets(self, second: int) -> None:
+        while self._completed and self._completed[0][0] <= second - THROUGHPUT_WINDOW:
+            self._completed.popleft()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            self._drop_old_buckets(int(time.time()))
+            completed = sum(count for _, count in self._completed)
+            counters = dict(self.counters)
+            in_flight = len(self._in_flight)
+        now = time.time()
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+        return {
+            **counters,
+            "in_flight": in_flight,
+            "uptime_s": round(now - self.started, 1),
+            "throughput_rps_60s": round(completed / THROUGHPUT_WINDOW, 3),
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)}
+        }
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+class RatingHandler(BaseHTTPRequestHandler):
+    """
+    GET  /rate?q=<query>     rate a restaurant query
+    POST /rate {"query": ..} same, with a JSON body
+    GET  /stats              latency/throughput counters
+    """
+    service: RatingService = None
+
+    def _send(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate(self, query: Optional[str]) -> None:
+        if not query:
+            self._send(400, {"error": "missing query"})
+            return
+        try:
+            self._send(200, self.service.rate(query))
+        except Exception as e:
+            logger.exception("rating failed for %r", query)
+            self._send(500, {"query": query, "error": str(e)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send(200, self.service.stats())
+        elif url.path == "/rate":
+            self._rate(parse_qs(url.query).get("q", [None])[0])
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/rate":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            query = json.loads(self.rfile.read(length) or b"{}").get("query")
+        except (ValueError, AttributeError):
+            self._send(400, {"error": "body must be a JSON object with a query"})
+            return
+        self._rate(query)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve restaurant rating queries from a warm process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    RatingHandler.service = RatingService()
+    server = ThreadingHTTPServer((args.host, args.port), RatingHandler)
+    logger.info("serving on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        RatingHandler.service.close()
@@ -0,0 +1,56 @@
+from ingest import ShardWriter, ingest, load_index, parse_review_line, read_restaurant_reviews
+from prefetch import name_matcher
+
+
+def test_name_with_period_after_guessed_prefix(tmp_path):
+    reviews = tmp_path / 'reviews.txt'
+    reviews.write_text(
+        "St. Louis. Great food, awful service.\n"
+        "St. Louis. The food at St. Louis was good, the service was average.\n"
+    )
+    ingest([str(reviews)], str(tmp_path / 'shards'))
+
+    data = read_restaurant_reviews('St. Louis', str(tmp_path / 'shards'))
+    assert list(data) == ['St. Louis']
+    assert data['St. Louis'] == ['The food at St. Louis was good, the service was average.']
+
+
+def test_repeated_name_beats_shorter_known_name():
+    line = "St. Louis. The food at St. Louis was good."
+    assert parse_review_line(line, {'st': 'St'}) == ('St. Louis', 'The food at St. Louis was good.')
+
+
+def test_interrupted_ingest_does_not_duplicate(tmp_path):
+    shards = str(tmp_path / 'shards')
+    writer = ShardWriter(shards)
+    writer.write('Subway', 'The food was good and the service was average.')
+    # Simulate a crash: flush the shard but never commit its digest or write index.json
+    for handle in writer._open.values():
+        handle.close()
+    writer._db.close()
+
+    assert 'subway' in load_index(shards)
+    reviews = tmp_path / 'reviews.txt'
+    reviews.write_text("Subway. The food was good and the service was average.\n")
+    assert ingest([str(reviews)], shards) == {'written': 0, 'duplicates': 1}
+
+
+def test_reopened_shard_keeps_dedupe(tmp_path, monkeypatch):
+    monkeypatch.setattr('ingest.MAX_OPEN_SHARDS', 1)
+    reviews = tmp_path / 'reviews.txt'
+    reviews.write_text(
+        "Subway. The food at Subway was good.\n"
+        "Wendy's. The food at Wendy's was bad.\n"
+        "Subway. The food at Subway was good.\n"
+    )
+    assert ingest([str(reviews)], str(tmp_path / 'shards')) == {'written': 2, 'duplicates': 1}
+
+
+def test_guessed_name_is_not_matched(tmp_path):
+    reviews = tmp_path / 'reviews.txt'
+    reviews.write_text("St. Elmo Steak House. Great food, awful service.\n")
+    shards = str(tmp_path / 'shards')
+    ingest([str(reviews)], shards)
+
+    assert load_index(shards)['st']['guessed']
+    assert name_matcher(shards, str(reviews)).match("How good is St. Elmo Steak House?") == []
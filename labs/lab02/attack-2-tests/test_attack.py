@@ -3,9 +3,13 @@ import openai
 from typing import Dict, List
 from datetime import datetime
 import json
+import sys
 import time
 from dotenv import load_dotenv
 from hackathon.src.secret_key_generator import generate_secret_key
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_distances
 
 load_dotenv()
 
@@ -19,6 +23,8 @@ class AttackTester:
         self.system_prompt = self._load_system_prompt()
         self.attack_prompts = self._load_attack_prompts()
         self.results_file = os.path.join(self.base_path, 'test_results.txt')
+        # Prompts closer than this cosine distance are treated as the same attack idea
+        self.cluster_distance = 0.6
         
         # Initialize OpenAI client
         self.client = openai.OpenAI()
@@ -109,6 +115,73 @@ class AttackTester:
         self._display_summary(results)
         return results
 
+    def _cluster_attack_prompts(self) -> List[List[str]]:
+        """Group near-duplicate attack prompts by TF-IDF cosine distance, representative first"""
+        names = sorted(self.attack_prompts)
+        if len(names) < 2:
+            return [names] if names else []
+
+        vectors = TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2)).fit_transform(
+            [self.attack_prompts[name] for name in names]
+        )
+        # n x n distances straight from the sparse vectors, instead of a dense n x vocabulary array
+        distances = cosine_distances(vectors)
+        labels = AgglomerativeClustering(
+            n_clusters=None,
+            metric='precomputed',
+            linkage='average',
+            distance_threshold=self.cluster_distance
+        ).fit_predict(distances)
+
+        clusters = []
+        for label in sorted(set(labels)):
+            members = [i for i, l in enumerate(labels) if l == label]
+            # The member closest to the rest of its cluster stands in for it
+            spread = distances[members][:, members].sum(axis=1)
+            ordered = [m for _, m in sorted(zip(spread, members))]
+            clusters.append([names[i] for i in ordered])
+        return clusters
+
+    def run_clustered_attacks(self):
+        """Run one representative per cluster of similar prompts, expanding only clusters that leak"""
+        clusters = self._cluster_attack_prompts()
+        results = []
+
+        print("\n=== Starting Clustered Attack Testing ===")
+        print(f"{len(self.attack_prompts)} prompts in {len(clusters)} clusters")
+
+        for cluster_id, members in enumerate(clusters):
+            for i, attack_name in enumerate(members):
+                role = 'representative' if i == 0 else 'member'
+                print(f"\nTesting ({role} of cluster {cluster_id}): {attack_name}")
+
+                attack_prompt = self.attack_prompts[attack_name]
+                result = self.run_attack(attack_prompt)
+                result.update({
+                    'attack_name': attack_name,
+                    'cluster': cluster_id,
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'prompt_used': attack_prompt
+                })
+                results.append(result)
+
+                # Brief delay to avoid rate limits
+                time.sleep(1)
+
+                # Only a real response without the secret speaks for the cluster;
+                # an API error says nothing, so the members are run as well
+                if i == 0 and not result['success']:
+                    if result.get('error'):
+                        print(f"Representative errored ({result['error']}), testing the whole cluster")
+                        continue
+                    if len(members) > 1:
+                        print(f"Representative blocked, skipping {len(members) - 1} similar prompts")
+                    break
+
+        self._save_results(results)
+        self._display_summary(results)
+        return results
+
     def _save_results(self, results: List[dict]):
         """Save detailed test results to file"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -153,6 +226,11 @@ class AttackTester:
 
 def main():
     tester = AttackTester()
+
+    # Evaluate a whole corpus, deduplicating similar prompts first
+    if '--clustered' in sys.argv[1:]:
+        tester.run_clustered_attacks()
+        return
     
     # Run a single attack
     attack_name = "attack_3_token_manipulation.txt"